@@ -1,11 +1,36 @@
 import streamlit as st
 import gspread
+from gspread.exceptions import APIError
+from gspread.http_client import HTTPClient
+from gspread.utils import rowcol_to_a1
 from google.oauth2.service_account import Credentials
 import pandas as pd
-from datetime import datetime
+import time
 
 st.set_page_config(page_title="Attendance Dashboard", layout="wide")
 
+# ----------------------------- #
+# Sheets HTTP client with bounded retries
+# ----------------------------- #
+class RetryHTTPClient(HTTPClient):
+    # Retry rate limits (429) and server errors (5xx) a few times with
+    # exponential backoff, then re-raise so load_data can show the error.
+    # The attempt count lives in the call, not on the client, because
+    # st.cache_resource shares the client across sessions and threads
+    RETRY_WAITS = (1, 2, 4)
+
+    def request(self, *args, **kwargs):
+        for wait in self.RETRY_WAITS:
+            try:
+                return super().request(*args, **kwargs)
+            except APIError as e:
+                if e.code != 429 and e.code < 500:
+                    raise
+            time.sleep(wait)
+
+        return super().request(*args, **kwargs)
+
+
 # ----------------------------- #
 # Load Google Sheets Client
 # ----------------------------- #
@@ -19,24 +44,142 @@ def get_gsheet_client():
         scopes=["https://www.googleapis.com/auth/spreadsheets"]
     )
 
-    client = gspread.authorize(creds)
+    # Bounded retries on rate-limited/5xx responses, and a timeout so one
+    # slow Sheets response can't hang the page indefinitely
+    client = gspread.authorize(creds, http_client=RetryHTTPClient)
+    client.set_timeout(30)
     return client
 
 
 # ----------------------------- #
-# Load data from Google Sheet
+# Cache spreadsheet handle
 # ----------------------------- #
-def load_data():
-    try:
-        client = get_gsheet_client()
+@st.cache_resource
+def get_spreadsheet():
+    # Opening the spreadsheet costs a metadata round-trip,
+    # so keep the handle for the whole process
+    client = get_gsheet_client()
+    return client.open_by_url(st.secrets["gsheet_url"])
+
+
+# ----------------------------- #
+# Read a sheet into a DataFrame
+# ----------------------------- #
+# Unformatted reads give both sides of the ID join the same values
+# (e.g. 123 for a cell shown as "0123"), and dates come back as serial
+# numbers (days since 1899-12-30) rather than locale-formatted strings,
+# so parsing the scan Timestamp is plain arithmetic
+UNFORMATTED_PARAMS = {
+    "valueRenderOption": "UNFORMATTED_VALUE",
+    "dateTimeRenderOption": "SERIAL_NUMBER",
+}
+
+# Values as shown in the sheet (dates, percents, currency), for display
+FORMATTED_PARAMS = {
+    "valueRenderOption": "FORMATTED_VALUE",
+}
+
+
+def read_values(range_name, params=UNFORMATTED_PARAMS):
+    # One values.get call, returning the raw 2-D value list
+    # (no worksheet lookup, no per-row dicts like get_all_records)
+    response = get_spreadsheet().values_get(range_name, params=params)
+    return response.get("values", [])
+
 
-        sheet = client.open_by_url(st.secrets["gsheet_url"])
+def values_to_frame(header, rows):
+    # The values API drops trailing empty cells, so pad each row to the
+    # header width with "" (the blank get_all_records used), trim cells
+    # past the last heading, and keep object dtype so a blank can't turn
+    # a numeric column into float
+    width = len(header)
+    fitted = [(row + [""] * width)[:width] for row in rows]
+    return pd.DataFrame(fitted, columns=header, dtype=object)
 
-        roster_ws = sheet.worksheet("Roster")
-        form_ws = sheet.worksheet("Form Responses")
 
-        roster_df = pd.DataFrame(roster_ws.get_all_records())
-        form_df = pd.DataFrame(form_ws.get_all_records())
+def read_sheet(range_name, params=UNFORMATTED_PARAMS):
+    rows = read_values(range_name, params)
+
+    if not rows:
+        return pd.DataFrame()
+
+    return values_to_frame(rows[0], rows[1:])
+
+
+# ----------------------------- #
+# Load roster (changes rarely)
+# ----------------------------- #
+# cache_resource hands every session the same DataFrame instead of
+# unpickling a copy per rerun - callers must not modify it in place
+@st.cache_resource(ttl=300)
+def load_roster():
+    # Roster columns are shown as formatted in the sheet; only the ID is
+    # taken unformatted, to compare like the IDs in Form Responses
+    # (one extra read per TTL, not per rerun)
+    roster_df = read_sheet("Roster", FORMATTED_PARAMS)
+    roster_df["ID"] = read_sheet("Roster")["ID"]
+
+    # Index by ID once so every rerun can join against it directly
+    roster_df["ID"] = roster_df["ID"].astype(str)
+    roster_df = roster_df.drop_duplicates("ID").set_index("ID")
+
+    return roster_df
+
+
+# ----------------------------- #
+# Load scans (only new rows)
+# ----------------------------- #
+# Re-read the whole sheet at least this often so edited responses show up
+RESPONSES_FULL_READ_TTL = 300
+
+
+def load_responses():
+    # Form Responses is normally only appended to, so keep the rows already
+    # read in this session and only fetch the ones past the last row we saw.
+    # A changed header row (new form question) or an expired TTL (edited
+    # responses) falls through to a full re-read
+    header = st.session_state.get("form_header")
+    read_at = st.session_state.get("form_read_at", 0)
+
+    if header and time.time() - read_at < RESPONSES_FULL_READ_TTL:
+        last_col = rowcol_to_a1(1, len(header))[:-1]
+
+        # Start from the last row already read (row 1 is the header):
+        # it always exists, whereas the row after it may be past the grid
+        last_row = len(st.session_state.form_rows) + 1
+
+        # Header and new rows in one round-trip
+        response = get_spreadsheet().values_batch_get(
+            [
+                "'Form Responses'!1:1",
+                f"'Form Responses'!A{last_row}:{last_col}",
+            ],
+            params=UNFORMATTED_PARAMS,
+        )
+        header_range, rows_range = response["valueRanges"]
+
+        if header_range.get("values", [[]])[0] == header:
+            st.session_state.form_rows.extend(rows_range.get("values", [])[1:])
+            return values_to_frame(header, st.session_state.form_rows)
+
+    rows = read_values("'Form Responses'")
+    st.session_state.form_header = rows[0] if rows else []
+    st.session_state.form_rows = rows[1:]
+    st.session_state.form_read_at = time.time()
+
+    if not st.session_state.form_header:
+        return pd.DataFrame()
+
+    return values_to_frame(st.session_state.form_header, st.session_state.form_rows)
+
+
+# ----------------------------- #
+# Load data from Google Sheet
+# ----------------------------- #
+def load_data():
+    try:
+        roster_df = load_roster()
+        form_df = load_responses()
 
         return roster_df, form_df
 
@@ -70,20 +213,28 @@ if roster_df is None:
 # ----------------------------- #
 # Process Data
 # ----------------------------- #
-# Convert timestamp
-form_df["Timestamp"] = pd.to_datetime(form_df["Timestamp"], errors="coerce")
-
-# Ensure ID is text
+# Convert timestamp (serial day numbers → datetime, rounded to the second)
+form_df["Timestamp"] = pd.to_datetime(
+    pd.to_numeric(form_df["Timestamp"], errors="coerce"),
+    unit="D",
+    origin="1899-12-30",
+).dt.round("s")
+
+# Ensure ID is text (roster is already indexed by ID)
 form_df["ID"] = form_df["ID"].astype(str)
-roster_df["ID"] = roster_df["ID"].astype(str)
 
-# Merge → attach student names to scan records
-merged_df = form_df.merge(roster_df, on="ID", how="left")
+# Join → attach student names to scan records
+# (columns in both sheets get merge's _x/_y suffixes)
+merged_df = form_df.join(
+    roster_df, on="ID", how="left", lsuffix="_x", rsuffix="_y", validate="m:1"
+)
 
 st.subheader("Today's Attendance")
 
-today = datetime.now().date()
-today_df = merged_df[merged_df["Timestamp"].dt.date == today]
+# Compare against day bounds directly (no per-row date objects)
+start = pd.Timestamp.now().normalize()
+end = start + pd.Timedelta(days=1)
+today_df = merged_df[(merged_df["Timestamp"] >= start) & (merged_df["Timestamp"] < end)]
 
 st.dataframe(today_df)
 